@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from .models import Project, Release, Audience, Note, Translation
+from .models import Project, Release, Audience, Note, Translation, Webhook, OutboxMessage
 
 ###############
 # MODEL INLINE
@@ -23,7 +23,7 @@ class ProjectAdmin(admin.ModelAdmin):
     )
     list_filter = ('created', 'updated', 'deleted', 'site')
     search_fields = ('name',)
-    readonly_fields = ['slug']
+    readonly_fields = ['slug', 'release_count', 'latest_release_date']
 
 
 @admin.register(Release)
@@ -34,11 +34,12 @@ class ReleaseAdmin(admin.ModelAdmin):
         'major',
         'minor',
         'patch',
-        # 'published',
+        'state',
+        'publish_at',
     )
-    list_filter = ('created', 'updated', 'deleted', 'project') #, 'published')
+    list_filter = ('created', 'updated', 'deleted', 'project', 'state')
     search_fields = ('name',)
-    readonly_fields = ['slug']
+    readonly_fields = ['slug', 'new_feature_count', 'bug_fix_count', 'known_issue_count']
 
 
 @admin.register(Audience)
@@ -74,3 +75,17 @@ class TranslationAdmin(admin.ModelAdmin):
     # list_filter = ('created', 'updated', 'deleted', 'site')
     # search_fields = ('name',)
     # readonly_fields = ['slug']
+
+
+@admin.register(Webhook)
+class WebhookAdmin(admin.ModelAdmin):
+    list_display = ('name', 'url', 'project', 'enabled', 'deleted')
+    list_filter = ('enabled', 'deleted', 'project')
+    search_fields = ('name', 'url')
+
+
+@admin.register(OutboxMessage)
+class OutboxMessageAdmin(admin.ModelAdmin):
+    list_display = ('uuid', 'event', 'webhook', 'status', 'attempts', 'next_attempt', 'delivered')
+    list_filter = ('status', 'event', 'webhook')
+    readonly_fields = ['uuid', 'payload', 'attempts', 'delivered', 'last_error']
@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class ReleaseNotesConfig(AppConfig):
     name = 'releasenotes'
+
+    def ready(self):
+        from releasenotes import signals     # noqa: F401 - Connects the signal receivers
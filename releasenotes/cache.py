@@ -0,0 +1,200 @@
+import hashlib
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.utils import timezone
+from django.utils.cache import patch_response_headers, patch_vary_headers
+
+from releasenotes import config
+from releasenotes.compression import IDENTITY, choose_encoding, compress, minify_html
+
+KEY_PREFIX = "releasenotes"
+
+
+def get_cache():
+    return caches[config.CACHE_ALIAS]
+
+
+def generation_key(project_slug):
+    return "{}:generation:{}".format(KEY_PREFIX, project_slug)
+
+
+def get_generation(project_slug, create=True):
+    '''
+    Every cached page of a project carries the project's generation in its key, so bumping it invalidates them all
+    without having to know which pages were cached.  With ``create=False`` a missing generation is returned as None
+    instead of being stored, so lookups for slugs that don't exist leave nothing behind.
+    '''
+    if not create:
+        return get_cache().get(generation_key(project_slug))
+    return get_cache().get_or_set(generation_key(project_slug), initial_generation, config.GENERATION_TIMEOUT)
+
+
+def initial_generation():
+    # Start from the clock rather than 1 so a flushed cache can't bring back the keys of pages cached before the flush
+    return time.time_ns()
+
+
+def bumped_key(project_slug):
+    return "{}:bumped:{}".format(KEY_PREFIX, project_slug)
+
+
+def bump_generation(*project_slugs):
+    for project_slug in project_slugs:
+        incr(generation_key(project_slug))
+    get_cache().set_many({bumped_key(project_slug): time.time() for project_slug in project_slugs}, config.REPLICA_LAG)
+
+
+def recently_bumped(project_slug):
+    '''
+    True while a replica may still be catching up with the change that last bumped the project's generation.
+    '''
+    return get_cache().get(bumped_key(project_slug)) is not None
+
+
+def incr(key):
+    cache = get_cache()
+    try:
+        cache.incr(key)
+    except ValueError:      # Key is missing, nothing has been cached under it yet
+        cache.set(key, initial_generation(), None)
+
+
+def sitemap_generation_key():
+    return "{}:sitemap-generation".format(KEY_PREFIX)
+
+
+def get_sitemap_generation():
+    return get_cache().get_or_set(sitemap_generation_key(), initial_generation, None)
+
+
+def bump_sitemap_generation():
+    incr(sitemap_generation_key())
+    get_cache().set(bumped_key(sitemap_generation_key()), time.time(), config.REPLICA_LAG)
+
+
+def sitemap_recently_bumped():
+    return get_cache().get(bumped_key(sitemap_generation_key())) is not None
+
+
+def page_key(project_slug, path, generation):
+    digest = hashlib.md5(path.encode("utf-8")).hexdigest()
+    return "{}:page:{}:{}:{}".format(KEY_PREFIX, project_slug, generation, digest)
+
+
+def sitemap_key(section, *parts):
+    return ":".join([KEY_PREFIX, "sitemap", str(get_sitemap_generation()), section] + [str(part) for part in parts])
+
+
+def get_timeout(next_publish_at=None, now=None, timeout=None):
+    '''
+    The cache timeout for a page, cut short so the entry expires exactly when the next scheduled release goes live.
+    '''
+    timeout = config.CACHE_TIMEOUT if timeout is None else timeout
+
+    if next_publish_at is not None:
+        seconds = math.ceil((next_publish_at - (now or timezone.now())).total_seconds())
+        timeout = max(0, min(timeout, seconds))
+
+    return timeout
+
+
+class CachedPage:
+    '''
+    A rendered page stored with its precompressed variants, so serving it never compresses anything.
+    '''
+
+    def __init__(self, variants, content_type, expires):
+        self.variants = variants
+        self.content_type = content_type
+        self.expires = expires
+
+    @classmethod
+    def from_response(cls, response, timeout):
+        content = response.content
+        if config.MINIFY_HTML and response["Content-Type"].startswith("text/html"):
+            content = minify_html(content.decode(response.charset)).encode(response.charset)
+        return cls(compress(content), response["Content-Type"], time.time() + timeout)
+
+    @property
+    def size(self):
+        return sum(len(content) for content in self.variants.values())
+
+    def to_response(self, request):
+        encoding = choose_encoding(request.META.get("HTTP_ACCEPT_ENCODING"), self.variants)
+        content = self.variants[encoding]
+
+        response = HttpResponse(content, content_type=self.content_type)
+        if encoding != IDENTITY:
+            response["Content-Encoding"] = encoding
+        response["Content-Length"] = str(len(content))
+        patch_vary_headers(response, ("Accept-Encoding",))
+        patch_response_headers(response, max(0, int(self.expires - time.time())))
+        return response
+
+
+class PageStore:
+    '''
+    In-process LRU store for cached pages that is kept within a byte budget.  Entries are costed by the size of all their
+    variants, and the least recently used ones are evicted to make room.
+
+    Pages are stored per process rather than in the shared cache.  A hit then hands back bytes that are ready to send,
+    with no network round trip or unpickling of every variant.  Invalidation still works across processes because the
+    keys include the project's generation, which lives in the shared cache.  The cost is that each process compresses
+    its own copy and holds up to RELEASENOTES_PAGE_CACHE_BYTES.
+    '''
+    ENTRY_OVERHEAD = 256        # Rough bytes for the key, the page object and the dict slot
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            page, cost = entry
+            if page.expires <= time.time():
+                self._discard(key)
+                return None
+
+            self._entries.move_to_end(key)
+            return page
+
+    def set(self, key, page):
+        cost = page.size + len(key) + self.ENTRY_OVERHEAD
+        if cost > self.max_bytes:
+            return False
+
+        with self._lock:
+            self._discard(key)
+            while self._entries and self.size + cost > self.max_bytes:
+                self._discard(next(iter(self._entries)))
+            self._entries[key] = (page, cost)
+            self.size += cost
+
+        return True
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def _discard(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= entry[1]
+
+
+page_store = PageStore(config.PAGE_CACHE_BYTES)
@@ -0,0 +1,89 @@
+import gzip
+import re
+
+from releasenotes import config
+
+try:
+    import brotli
+except ImportError:     # Brotli is optional, pages are stored with gzip only without it
+    brotli = None
+
+IDENTITY = "identity"
+GZIP = "gzip"
+BROTLI = "br"
+
+PREFERRED_ENCODINGS = (BROTLI, GZIP)        # Smallest first
+
+PRESERVE_RE = re.compile(r"<(pre|textarea|script|style)\b.*?</\1\s*>", re.IGNORECASE | re.DOTALL)
+WHITESPACE_RE = re.compile(r"\s+")
+
+
+def minify_html(html):
+    '''
+    Collapses runs of whitespace to a single space, leaving pre, textarea, script and style blocks untouched.  The
+    browser already renders collapsed whitespace the same way, so the output looks identical.
+    '''
+    parts = []
+    position = 0
+
+    for match in PRESERVE_RE.finditer(html):
+        parts.append(WHITESPACE_RE.sub(" ", html[position:match.start()]))
+        parts.append(match.group(0))
+        position = match.end()
+
+    parts.append(WHITESPACE_RE.sub(" ", html[position:]))
+    return "".join(parts)
+
+
+def compress(content):
+    '''
+    Returns the content in every encoding that is available and actually smaller than the original.
+    '''
+    variants = {IDENTITY: content}
+
+    compressed = gzip.compress(content, compresslevel=config.GZIP_LEVEL, mtime=0)
+    if len(compressed) < len(content):
+        variants[GZIP] = compressed
+
+    if brotli is not None:
+        compressed = brotli.compress(content, quality=config.BROTLI_QUALITY)
+        if len(compressed) < len(content):
+            variants[BROTLI] = compressed
+
+    return variants
+
+
+def parse_accept_encoding(header):
+    '''
+    Maps each coding in an Accept-Encoding header to its q value.
+    '''
+    accepted = {}
+
+    for item in header.split(","):
+        coding, _, params = item.strip().partition(";")
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name.lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[coding.strip().lower()] = quality
+
+    return accepted
+
+
+def choose_encoding(header, available):
+    '''
+    Picks the smallest available encoding the client accepts, falling back to identity.
+    '''
+    accepted = parse_accept_encoding(header or "")
+
+    for encoding in PREFERRED_ENCODINGS:
+        if encoding in available and accepted.get(encoding, accepted.get("*", 0)) > 0:
+            return encoding
+
+    return IDENTITY
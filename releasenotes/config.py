@@ -1,5 +1,59 @@
-# from django.conf import settings
+from django.conf import settings
 
 # settings.LANGUAGE_CODE
 
 # LANGUAGE_CODE = getattr(settings, "LANGUAGE_CODE")
+
+###
+# WEBHOOKS
+###
+
+WEBHOOK_BATCH_SIZE = getattr(settings, "RELEASENOTES_WEBHOOK_BATCH_SIZE", 100)
+WEBHOOK_WORKERS = getattr(settings, "RELEASENOTES_WEBHOOK_WORKERS", 8)
+WEBHOOK_TIMEOUT = getattr(settings, "RELEASENOTES_WEBHOOK_TIMEOUT", 10)                 # Seconds
+WEBHOOK_MAX_ATTEMPTS = getattr(settings, "RELEASENOTES_WEBHOOK_MAX_ATTEMPTS", 8)
+WEBHOOK_BACKOFF = getattr(settings, "RELEASENOTES_WEBHOOK_BACKOFF", 30)                 # Seconds, doubled after every failed attempt
+WEBHOOK_MAX_BACKOFF = getattr(settings, "RELEASENOTES_WEBHOOK_MAX_BACKOFF", 6 * 60 * 60)
+WEBHOOK_LEASE = getattr(settings, "RELEASENOTES_WEBHOOK_LEASE", 5 * 60)                 # Seconds a claimed message is hidden from other workers
+BASE_URL = getattr(settings, "RELEASENOTES_BASE_URL", None)                             # e.g. "https://example.com", defaults to the project's site
+URL_SCHEME = getattr(settings, "RELEASENOTES_URL_SCHEME", "https")                      # Used with the site's domain when no BASE_URL is set
+
+###
+# CACHING
+###
+
+CACHE_ALIAS = getattr(settings, "RELEASENOTES_CACHE_ALIAS", "default")
+CACHE_TIMEOUT = getattr(settings, "RELEASENOTES_CACHE_TIMEOUT", 60 * 60)               # Seconds, 0 disables page caching
+GENERATION_TIMEOUT = getattr(settings, "RELEASENOTES_GENERATION_TIMEOUT", 7 * 24 * 60 * 60)    # An expired generation starts over from the clock, so it only costs a miss
+
+###
+# DATABASE ROUTING
+###
+
+STICKY_COOKIE = getattr(settings, "RELEASENOTES_STICKY_COOKIE", "releasenotes_primary")
+STICKY_SECONDS = getattr(settings, "RELEASENOTES_STICKY_SECONDS", 30)                  # Reads stay on the primary this long after a staff save
+REPLICA_LAG = getattr(settings, "RELEASENOTES_REPLICA_LAG", 30)                        # Cached pages are rendered from the primary this long after a change
+
+###
+# SITEMAPS
+###
+
+SITEMAP_LIMIT = getattr(settings, "RELEASENOTES_SITEMAP_LIMIT", 50000)                 # URLs per sitemap page, 50k is the protocol maximum
+SITEMAP_CACHE_TIMEOUT = getattr(settings, "RELEASENOTES_SITEMAP_CACHE_TIMEOUT", 24 * 60 * 60)
+
+###
+# LISTINGS
+###
+
+RELEASES_PER_PAGE = getattr(settings, "RELEASENOTES_RELEASES_PER_PAGE", 25)
+
+###
+# COMPRESSED PAGES
+###
+
+# Compressed pages are kept in each process's memory, not the shared cache, so the budget applies per process: 8 workers
+# with the default can hold up to 256MiB between them.
+PAGE_CACHE_BYTES = getattr(settings, "RELEASENOTES_PAGE_CACHE_BYTES", 32 * 1024 * 1024)
+MINIFY_HTML = getattr(settings, "RELEASENOTES_MINIFY_HTML", False)
+GZIP_LEVEL = getattr(settings, "RELEASENOTES_GZIP_LEVEL", 6)                            # Pages are compressed on a cache miss, inside the request
+BROTLI_QUALITY = getattr(settings, "RELEASENOTES_BROTLI_QUALITY", 5)                    # Higher qualities take far longer for a few % less
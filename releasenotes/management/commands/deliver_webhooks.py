@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from releasenotes import config
+from releasenotes.webhooks import drain_outbox
+
+
+class Command(BaseCommand):
+    help = "Deliver queued release webhooks from the outbox"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=config.WEBHOOK_BATCH_SIZE, help="Messages claimed per batch")
+        parser.add_argument("--workers", type=int, default=config.WEBHOOK_WORKERS, help="Concurrent HTTP requests")
+        parser.add_argument("--timeout", type=float, default=config.WEBHOOK_TIMEOUT, help="HTTP timeout in seconds")
+        parser.add_argument("--max-attempts", type=int, default=config.WEBHOOK_MAX_ATTEMPTS, help="Attempts before a message is marked as failed")
+        parser.add_argument("--loop", action="store_true", help="Keep polling the outbox instead of exiting once it is empty")
+        parser.add_argument("--sleep", type=float, default=5, help="Seconds to wait between polls when looping")
+
+    def handle(self, *args, **options):
+        while True:
+            delivered, failed = drain_outbox(
+                batch_size=options["batch_size"],
+                workers=options["workers"],
+                timeout=options["timeout"],
+                max_attempts=options["max_attempts"],
+            )
+
+            if delivered or failed or options["verbosity"] > 1:
+                self.stdout.write("Delivered {}, failed {}".format(delivered, failed))
+
+            if not options["loop"]:
+                break
+
+            time.sleep(options["sleep"])
@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from releasenotes.models import Release
+
+
+class Command(BaseCommand):
+    help = "Publish future releases whose publish time has passed"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--loop", action="store_true", help="Keep checking for due releases instead of exiting")
+        parser.add_argument("--sleep", type=float, default=60, help="Seconds to wait between checks when looping")
+
+    def handle(self, *args, **options):
+        while True:
+            published = Release.objects.publish_due()
+
+            if published or options["verbosity"] > 1:
+                self.stdout.write("Published {} release(s)".format(len(published)))
+
+            if not options["loop"]:
+                break
+
+            time.sleep(options["sleep"])
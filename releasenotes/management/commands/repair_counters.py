@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from releasenotes.models import Project, Release
+
+
+class Command(BaseCommand):
+    help = "Recompute the denormalized note and release counters"
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            releases = Release.objects.all().recount_notes()
+            projects = Project.objects.all().recount_releases()
+
+        self.stdout.write("Recounted {} release(s) and {} project(s)".format(releases, projects))
@@ -0,0 +1,62 @@
+# Generated by Django 3.1.14 on 2026-10-19 11:15
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('releasenotes', '0002_auto_20201126_1536'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Webhook',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='date created')),
+                ('updated', models.DateTimeField(auto_now=True, verbose_name='last updated')),
+                ('deleted', models.BooleanField(default=False, verbose_name='deleted')),
+                ('uuid', models.UUIDField(default=uuid.uuid4, editable=False, unique=True)),
+                ('name', models.CharField(max_length=80, verbose_name='Name')),
+                ('url', models.URLField(max_length=500, verbose_name='URL')),
+                ('secret', models.CharField(blank=True, help_text='Used to sign the payload with HMAC-SHA256', max_length=128, verbose_name='Secret')),
+                ('enabled', models.BooleanField(default=True, verbose_name='Enabled')),
+                ('project', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='webhooks', to='releasenotes.project', verbose_name='Project')),
+            ],
+            options={
+                'verbose_name': 'Webhook',
+                'verbose_name_plural': 'Webhooks',
+            },
+        ),
+        migrations.CreateModel(
+            name='OutboxMessage',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='date created')),
+                ('updated', models.DateTimeField(auto_now=True, verbose_name='last updated')),
+                ('deleted', models.BooleanField(default=False, verbose_name='deleted')),
+                ('uuid', models.UUIDField(default=uuid.uuid4, editable=False, unique=True)),
+                ('event', models.CharField(max_length=50, verbose_name='Event')),
+                ('payload', models.JSONField(verbose_name='Payload')),
+                ('status', models.IntegerField(choices=[(0, 'Pending'), (10, 'Delivered'), (20, 'Failed')], default=0, verbose_name='Status')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='Attempts')),
+                ('next_attempt', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Next Attempt')),
+                ('delivered', models.DateTimeField(blank=True, null=True, verbose_name='Delivered')),
+                ('last_error', models.TextField(blank=True, verbose_name='Last Error')),
+                ('release', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='outbox_messages', to='releasenotes.release', verbose_name='Release')),
+                ('webhook', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='messages', to='releasenotes.webhook', verbose_name='Webhook')),
+            ],
+            options={
+                'verbose_name': 'Outbox Message',
+                'verbose_name_plural': 'Outbox Messages',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='outboxmessage',
+            index=models.Index(fields=['status', 'next_attempt'], name='releasenote_status_c90bbe_idx'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 3.1.14 on 2026-10-19 11:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('releasenotes', '0003_auto_20261019_1115'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='release',
+            name='publish_at',
+            field=models.DateTimeField(blank=True, help_text='When a future release is published by the scheduler', null=True, verbose_name='Publish At'),
+        ),
+        migrations.AddIndex(
+            model_name='release',
+            index=models.Index(fields=['project', 'state', 'publish_at'], name='releasenote_project_25e842_idx'),
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 3.1.14 on 2026-10-19 11:20
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+
+def count_existing(apps, schema_editor):
+    Project = apps.get_model('releasenotes', 'Project')
+    Release = apps.get_model('releasenotes', 'Release')
+    Note = apps.get_model('releasenotes', 'Note')
+
+    counters = {}
+    for note_type, field in [(0, 'new_feature_count'), (10, 'bug_fix_count'), (20, 'known_issue_count')]:
+        notes = Note.objects.filter(release=models.OuterRef('pk'), note_type=note_type).order_by().values('release')
+        counters[field] = Coalesce(models.Subquery(notes.annotate(count=models.Count('pk')).values('count')), 0)
+    Release.objects.update(**counters)
+
+    published = models.Q(state__in=[10, 20]) | models.Q(state=0, publish_at__lte=timezone.now())
+    releases = Release.objects.filter(published, project=models.OuterRef('pk')).order_by().values('project')
+    Project.objects.update(
+        release_count=Coalesce(models.Subquery(releases.annotate(count=models.Count('pk')).values('count')), 0),
+        latest_release_date=models.Subquery(releases.annotate(latest=models.Max(Coalesce('publish_at', 'created'))).values('latest')),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('releasenotes', '0004_auto_20261019_1116'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='latest_release_date',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Latest Release Date'),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='release_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Release Count'),
+        ),
+        migrations.AddField(
+            model_name='release',
+            name='bug_fix_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Bug Fix Count'),
+        ),
+        migrations.AddField(
+            model_name='release',
+            name='known_issue_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Known Issue Count'),
+        ),
+        migrations.AddField(
+            model_name='release',
+            name='new_feature_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='New Feature Count'),
+        ),
+        migrations.RunPython(count_existing, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 3.1.14 on 2026-10-19 11:21
+
+import re
+
+from django.db import migrations, models
+
+
+def allocate_slug(queryset, base, max_length=50, field='slug', fallback='item'):
+    # Frozen copy of releasenotes.slugs.allocate_slug, so later changes to the app don't change this migration
+    base = (base or fallback)[:max_length]
+
+    while True:
+        taken = set(queryset.filter(**{field + '__startswith': base}).values_list(field, flat=True))
+        if base not in taken:
+            return base
+
+        pattern = re.compile(r'^{}-(\d+)$'.format(re.escape(base)))
+        used = {int(match.group(1)) for match in map(pattern.match, taken) if match}
+        number = 2
+        while number in used:
+            number += 1
+
+        suffix = '-{}'.format(number)
+        if len(base) + len(suffix) <= max_length:
+            return base + suffix
+
+        base = base[:max_length - len(suffix)]
+
+
+def deduplicate_slugs(apps, schema_editor):
+    '''
+    Give every duplicate slug a numbered suffix so the unique constraints can be created.
+    '''
+    for model_name, scope in [('Project', 'site_id'), ('Release', 'project_id'), ('Audience', 'project_id')]:
+        Model = apps.get_model('releasenotes', model_name)
+        duplicates = Model.objects.values(scope, 'slug').annotate(count=models.Count('pk')).filter(count__gt=1)
+
+        for duplicate in duplicates:
+            rows = Model.objects.filter(**{scope: duplicate[scope], 'slug': duplicate['slug']}).order_by('pk')
+            for row in rows[1:]:        # The oldest row keeps its slug
+                row.slug = allocate_slug(Model.objects.filter(**{scope: duplicate[scope]}), row.slug, Model._meta.get_field('slug').max_length)
+                row.save(update_fields=['slug'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('releasenotes', '0005_auto_20261019_1120'),
+    ]
+
+    operations = [
+        migrations.RunPython(deduplicate_slugs, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='audience',
+            constraint=models.UniqueConstraint(fields=('project', 'slug'), name='releasenotes_audience_unique_slug'),
+        ),
+        migrations.AddConstraint(
+            model_name='project',
+            constraint=models.UniqueConstraint(fields=('site', 'slug'), name='releasenotes_project_unique_slug'),
+        ),
+        migrations.AddConstraint(
+            model_name='release',
+            constraint=models.UniqueConstraint(fields=('project', 'slug'), name='releasenotes_release_unique_slug'),
+        ),
+    ]
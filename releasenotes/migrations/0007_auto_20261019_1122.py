@@ -0,0 +1,43 @@
+# Generated by Django 3.1.14 on 2026-10-19 11:22
+
+import re
+
+from django.db import migrations, models
+
+
+def get_patch_key(patch, digits=10):
+    # Frozen copy of releasenotes.models.get_patch_key, so later changes to the model don't change this migration
+    match = re.match(r'^(\d+)(.*)$', patch or '', re.DOTALL)
+    if not match:
+        return patch or ''
+    number, suffix = match.groups()
+    if not re.match(r'^[-a-zA-Z]', suffix):
+        suffix = '~' + suffix
+    return number.zfill(digits) + suffix
+
+
+def fill_patch_keys(apps, schema_editor):
+    Release = apps.get_model('releasenotes', 'Release')
+    for release in Release.objects.exclude(patch='').only('pk', 'patch').iterator():     # An empty patch keeps an empty key
+        release.patch_key = get_patch_key(release.patch)
+        release.save(update_fields=['patch_key'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('releasenotes', '0006_auto_20261019_1121'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='release',
+            name='patch_key',
+            field=models.CharField(blank=True, editable=False, max_length=60, verbose_name='Patch Sort Key'),
+        ),
+        migrations.RunPython(fill_patch_keys, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='release',
+            index=models.Index(fields=['project', 'major', 'minor', 'patch_key', 'id'], name='releasenote_project_8de490_idx'),
+        ),
+    ]
@@ -1,13 +1,20 @@
+import re
 import uuid
 
 from django.conf import settings
-from django.db import models
+from django.db import models, transaction
 from django.utils.translation import ugettext as _
 from django.urls import reverse
 from django.contrib.sites.models import Site
 from django.contrib.sites.managers import CurrentSiteManager
 from django.contrib.auth.models import Permission
 from django.utils.text import slugify
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from releasenotes import config
+from releasenotes.cache import bump_generation, bump_sitemap_generation
+from releasenotes.slugs import UniqueSlugMixin
 
 ###
 # HELPERS - TO NOT TRIGGER MIGRATIONS ON USER'S SITES
@@ -44,11 +51,151 @@ class CreateUpdateModelBase(models.Model):
         abstract = True
 
 
+class TrackedFieldsMixin:
+    '''
+    Remembers the values of ``tracked_fields`` as they were loaded from the database, so saves can tell what changed
+    without querying for the old row.
+    '''
+    tracked_fields = ()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = {name: getattr(instance, name) for name in cls.tracked_fields if name in field_names}
+        return instance
+
+    def get_loaded_value(self, name, default=None):
+        return getattr(self, "_loaded_values", {}).get(name, default)
+
+    def has_changed(self, name):
+        loaded_values = getattr(self, "_loaded_values", {})
+        if self._state.adding or name not in loaded_values:
+            return True
+        return loaded_values[name] != getattr(self, name)
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._loaded_values = {name: getattr(self, name) for name in self.tracked_fields}
+
+    def refresh_from_db(self, using=None, fields=None):
+        super().refresh_from_db(using=using, fields=fields)
+        loaded_values = getattr(self, "_loaded_values", {})
+        deferred = self.get_deferred_fields()
+        for name in self.tracked_fields:
+            if name not in deferred and (fields is None or name in fields or name.replace("_id", "") in fields):
+                loaded_values[name] = getattr(self, name)
+        self._loaded_values = loaded_values
+
+
+###############
+# QUERYSETS
+###############
+
+class ProjectQuerySet(models.QuerySet):
+
+    def recount_releases(self):
+        '''
+        Recompute the denormalized release counters of every project in the queryset with a single UPDATE.  Only
+        published releases are counted, so the counts match the public listing.
+        '''
+        releases = Release.objects.published().filter(project=models.OuterRef("pk")).order_by().values("project")
+        return self.update(
+            release_count=Coalesce(models.Subquery(releases.annotate(count=models.Count("pk")).values("count")), 0),
+            latest_release_date=models.Subquery(releases.annotate(latest=models.Max(Coalesce("publish_at", "created"))).values("latest")),
+        )
+
+
+class ReleaseQuerySet(models.QuerySet):
+
+    def published(self, now=None):
+        '''
+        Releases visible to the public.  A future release becomes visible as soon as its publish time has passed, even if
+        the scheduler has not switched its state yet.
+        '''
+        now = now or timezone.now()
+        return self.filter(
+            models.Q(state__in=[Release.ReleaseState.CURRENT, Release.ReleaseState.PREVIOUS]) |
+            models.Q(state=Release.ReleaseState.FUTURE, publish_at__lte=now)
+        )
+
+    def scheduled(self, now=None):
+        '''
+        Future releases with a publish time that has not been reached yet.
+        '''
+        return self.filter(state=Release.ReleaseState.FUTURE, publish_at__gt=now or timezone.now())
+
+    def due(self, now=None):
+        return self.filter(state=Release.ReleaseState.FUTURE, publish_at__lte=now or timezone.now())
+
+    def next_publish_at(self, now=None):
+        return self.scheduled(now).aggregate(next_publish_at=models.Min("publish_at"))["next_publish_at"]
+
+    def newest_first(self):
+        return self.order_by("-major", "-minor", "-patch_key", "-pk")
+
+    def oldest_first(self):
+        return self.order_by("major", "minor", "patch_key", "pk")
+
+    def seek(self, version_key, older=True):
+        '''
+        Keyset filter for releases older (or newer) than the ``(major, minor, patch_key, pk)`` version key, so pages are
+        found through the version index instead of an OFFSET scan.
+        '''
+        lookup = "lt" if older else "gt"
+        condition = models.Q()
+        equal = {}
+
+        for name, value in zip(Release.VERSION_KEY, version_key):
+            condition |= models.Q(**equal, **{"{}__{}".format(name, lookup): value})
+            equal[name] = value
+
+        return self.filter(condition)
+
+    def recount_notes(self):
+        '''
+        Recompute the denormalized note counters of every release in the queryset with a single UPDATE.
+        '''
+        counters = {}
+        for note_type, field in Note.COUNTER_FIELDS.items():
+            notes = Note.objects.filter(release=models.OuterRef("pk"), note_type=note_type).order_by().values("release")
+            counters[field] = Coalesce(models.Subquery(notes.annotate(count=models.Count("pk")).values("count")), 0)
+        return self.update(**counters)
+
+    def publish_due(self, now=None):
+        '''
+        Move every due future release to CURRENT in bulk.  The latest due release of each project becomes the current
+        one, every other current or due release of those projects becomes PREVIOUS.  Returns the published release ids.
+        '''
+        now = now or timezone.now()
+
+        with transaction.atomic():
+            due = list(self.due(now).select_for_update().order_by("publish_at", "pk").values_list("pk", "project_id"))
+            if not due:
+                return []
+
+            current = {project_id: pk for pk, project_id in due}       # Later entries win, so this is the latest per project
+            current_ids = list(current.values())
+
+            Release.objects.filter(project__in=current.keys()).filter(
+                models.Q(state=Release.ReleaseState.CURRENT) | models.Q(pk__in=[pk for pk, project_id in due])
+            ).exclude(pk__in=current_ids).update(state=Release.ReleaseState.PREVIOUS, updated=now)
+            Release.objects.filter(pk__in=current_ids).update(state=Release.ReleaseState.CURRENT, updated=now)
+
+            Project.objects.filter(pk__in=current.keys()).recount_releases()
+            OutboxMessage.objects.queue_releases_published(Release.objects.filter(pk__in=current_ids).select_related("project__site"))
+
+            project_slugs = list(Project.objects.filter(pk__in=current.keys()).values_list("slug", flat=True))
+            transaction.on_commit(lambda: bump_generation(*project_slugs))     # Bulk updates skip the save signals
+            transaction.on_commit(bump_sitemap_generation)
+
+        return current_ids
+
+
 ###############
 # MODELS
 ###############
 
-class Project(CreateUpdateModelBase):
+class Project(UniqueSlugMixin, TrackedFieldsMixin, CreateUpdateModelBase):
     """
     The Project the release notes are for.
     """
@@ -56,13 +203,19 @@ class Project(CreateUpdateModelBase):
     name = models.CharField(_("Name"), max_length=80, blank=False)
     site = models.ForeignKey(Site, verbose_name=_("Site"), on_delete=models.CASCADE, default=get_default_site, related_name="projects")
     slug = models.SlugField(_("Slug"))
+    release_count = models.PositiveIntegerField(_("Release Count"), default=0, editable=False)
+    latest_release_date = models.DateTimeField(_("Latest Release Date"), blank=True, null=True, editable=False)
 
-    objects = models.Manager()
+    objects = ProjectQuerySet.as_manager()
     on_site = CurrentSiteManager()
 
+    tracked_fields = ("name", "site_id")
+    slug_scope = ("site_id",)
+
     class Meta:
         verbose_name = _("Project")
         verbose_name_plural = _("Projects")
+        constraints = [models.UniqueConstraint(fields=["site", "slug"], name="releasenotes_project_unique_slug")]
 
     def __str__(self):
         return self.name
@@ -70,13 +223,26 @@ class Project(CreateUpdateModelBase):
     def get_absolute_url(self):
         return reverse("releasenotes:project-details", kwargs={"project_slug": self.slug})
 
-    def save(self, *args, **kwargs):
-        value = self.name
-        self.slug = slugify(value, allow_unicode=True)      # Add check to make sure it's unique on the site
-        super().save(*args, **kwargs)
+    def get_slug_source(self):
+        return slugify(self.name, allow_unicode=True)
+
 
+def get_patch_key(patch, digits=10):
+    '''
+    The patch is free text, so its leading number is zero-padded to sort numerically ("9" before "10").  A suffix
+    starting with "-" or a letter marks a pre-release that sorts before the bare number ("2-rc1" before "2"), any
+    other suffix sorts after it ("2.1" after "2").
+    '''
+    match = re.match(r"^(\d+)(.*)$", patch or "", re.DOTALL)
+    if not match:
+        return patch or ""
+    number, suffix = match.groups()
+    if not re.match(r"^[-a-zA-Z]", suffix):
+        suffix = "~" + suffix       # "~" sorts after "-", digits and letters
+    return number.zfill(digits) + suffix
 
-class Release(CreateUpdateModelBase):
+
+class Release(UniqueSlugMixin, TrackedFieldsMixin, CreateUpdateModelBase):
     """
     This is the actual release
     """
@@ -93,11 +259,29 @@ class Release(CreateUpdateModelBase):
     major = models.IntegerField(_("Major"))
     minor = models.IntegerField(_("Minor"))
     patch = models.CharField(_("Patch"), max_length=50, blank=True)
+    patch_key = models.CharField(_("Patch Sort Key"), max_length=60, blank=True, editable=False)
     state =  models.IntegerField(_("Release State"), default=ReleaseState.CURRENT, choices=ReleaseState.choices)
+    publish_at = models.DateTimeField(_("Publish At"), blank=True, null=True, help_text="When a future release is published by the scheduler")
+    new_feature_count = models.PositiveIntegerField(_("New Feature Count"), default=0, editable=False)
+    bug_fix_count = models.PositiveIntegerField(_("Bug Fix Count"), default=0, editable=False)
+    known_issue_count = models.PositiveIntegerField(_("Known Issue Count"), default=0, editable=False)
+
+    objects = ReleaseQuerySet.as_manager()
+
+    tracked_fields = ("project_id", "name", "major", "minor", "patch", "state", "publish_at")
+    slug_source_fields = ("name", "major", "minor", "patch")
+    slug_scope = ("project_id",)
+
+    VERSION_KEY = ("major", "minor", "patch_key", "pk")     # The order releases are listed in
 
     class Meta:
         verbose_name = _("Release")
         verbose_name_plural = _("Releases")
+        indexes = [
+            models.Index(fields=["project", "state", "publish_at"]),
+            models.Index(fields=["project", "major", "minor", "patch_key", "id"]),
+        ]
+        constraints = [models.UniqueConstraint(fields=["project", "slug"], name="releasenotes_release_unique_slug")]
 
     @property
     def version_number(self):
@@ -119,13 +303,82 @@ class Release(CreateUpdateModelBase):
     def get_absolute_url(self):
         return reverse("releasenotes:release-details", kwargs={"release_slug": self.slug, "project_slug": self.project.slug})
 
+    @property
+    def published_date(self):
+        return self.publish_at or self.created
+
+    def is_published(self, now=None):
+        # Same rule as ReleaseQuerySet.published(), for a single instance
+        if self.state != self.ReleaseState.FUTURE:
+            return True
+        return self.publish_at is not None and self.publish_at <= (now or timezone.now())
+
+    @property
+    def version_key(self):
+        return tuple(getattr(self, name) for name in self.VERSION_KEY)
+
+    def get_notes_by_type(self):
+        '''
+        The release's notes grouped for display, loaded with a single query.
+        '''
+        notes = {"new_features": [], "bug_fixes": [], "known_issues": []}
+        groups = dict(zip([Note.NoteType.NEW_FEATURE, Note.NoteType.BUG_FIX, Note.NoteType.KNOWN_ISSUES], notes.values()))
+
+        for note in self.notes.select_related("audience").order_by("order", "pk"):
+            groups[note.note_type].append(note)
+
+        return notes
+
+    def is_being_published(self):
+        '''
+        True when this save moves the release into the CURRENT state.
+        '''
+        if self.state != self.ReleaseState.CURRENT:
+            return False
+        if self._state.adding or self.pk is None:
+            return True
+        if "state" in getattr(self, "_loaded_values", {}):
+            return self.has_changed("state")
+        return Release.objects.filter(pk=self.pk).exclude(state=self.ReleaseState.CURRENT).exists()
+
+    def get_webhook_payload(self):
+        return {
+            "uuid": str(self.uuid),
+            "project": {"uuid": str(self.project.uuid), "name": self.project.name, "slug": self.project.slug},
+            "name": self.name,
+            "slug": self.slug,
+            "version": self.version_number,
+            "version_name": self.version_name,
+            "url": self.get_full_url(),
+        }
+
+    def get_full_url(self):
+        '''
+        Absolute URL for use outside the site, built from RELEASENOTES_BASE_URL or the project's site domain.
+        '''
+        base_url = config.BASE_URL or "{}://{}".format(config.URL_SCHEME, self.project.site.domain)
+        return base_url.rstrip("/") + self.get_absolute_url()
+
+    def get_slug_source(self):
+        return ".".join([slugify(part, allow_unicode=True) for part in self.version_name.split(".")])      # This is done to keep the periods in the slug
+
     def save(self, *args, **kwargs):
-        self.slug = ".".join([slugify(part, allow_unicode=True) for part in self.version_name.split(".")])      # This is done to keep the periods in the slug
-        # TODO: If this is changed to current, make sure there are no other are set to current
-        super().save(*args, **kwargs)
+        publishing = self.is_being_published()
+
+        self.patch_key = get_patch_key(self.patch)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "patch" in update_fields:
+            kwargs["update_fields"] = set(update_fields) | {"patch_key"}
+
+        with transaction.atomic():      # The demotion and outbox rows commit (or roll back) together with the release
+            super().save(*args, **kwargs)
+            if publishing:
+                # Only one current release per project, same as publish_due()
+                Release.objects.filter(project=self.project_id, state=self.ReleaseState.CURRENT).exclude(pk=self.pk).update(state=self.ReleaseState.PREVIOUS, updated=timezone.now())
+                OutboxMessage.objects.queue_releases_published([self])
 
 
-class Audience(models.Model):
+class Audience(UniqueSlugMixin, TrackedFieldsMixin, models.Model):
     """
     Users a note is targetd at.
     """
@@ -136,9 +389,13 @@ class Audience(models.Model):
     slug = models.SlugField(_("Slug"))
     permission = models.ForeignKey(Permission, verbose_name=_("Permission"), on_delete=models.CASCADE, related_name="permafrost_role", blank=True, null=True)
 
+    tracked_fields = ("name", "project_id")
+    slug_scope = ("project_id",)
+
     class Meta:
         verbose_name = _("Audience")
         verbose_name_plural = _("Audiences")
+        constraints = [models.UniqueConstraint(fields=["project", "slug"], name="releasenotes_audience_unique_slug")]
 
     def __str__(self):
         return self.name
@@ -146,13 +403,11 @@ class Audience(models.Model):
     def get_absolute_url(self):
         return reverse("Audience_detail", kwargs={"pk": self.pk})
 
-    def save(self, *args, **kwargs):
-        value = self.name
-        self.slug = slugify(value, allow_unicode=True)      # Add check to make sure it's unique...
-        super().save(*args, **kwargs)
+    def get_slug_source(self):
+        return slugify(self.name, allow_unicode=True)
 
 
-class Note(CreateUpdateModelBase):
+class Note(TrackedFieldsMixin, CreateUpdateModelBase):
     """
     Note Sections attached to the Release.  These can be restricted to certian users via Django's permissions.
     """
@@ -162,6 +417,12 @@ class Note(CreateUpdateModelBase):
         BUG_FIX = 10, _("Bug Fixes")
         KNOWN_ISSUES = 20, _("Known Issues")
 
+    COUNTER_FIELDS = {      # The Release field that counts each type of note
+        NoteType.NEW_FEATURE: "new_feature_count",
+        NoteType.BUG_FIX: "bug_fix_count",
+        NoteType.KNOWN_ISSUES: "known_issue_count",
+    }
+
     uuid = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
     note_type =  models.IntegerField(_("Note Type"), default=NoteType.NEW_FEATURE, choices=NoteType.choices)
     release = models.ForeignKey(Release, verbose_name=_("release"), on_delete=models.CASCADE, related_name="notes")
@@ -169,6 +430,8 @@ class Note(CreateUpdateModelBase):
     description = models.TextField(_("Description"))
     order = models.IntegerField(_("Order"), blank=True, default=0, help_text="The lower the number, the closer to the top of the list the note apears")
 
+    tracked_fields = ("release_id", "note_type")
+
     class Meta:
         verbose_name = _("Note")
         verbose_name_plural = _("Notes")
@@ -182,6 +445,10 @@ class Note(CreateUpdateModelBase):
     def get_absolute_url(self):
         return reverse("releasenotes:note-detail", kwargs={"pk": self.pk})
 
+    def save(self, *args, **kwargs):
+        with transaction.atomic():      # Keeps the release's note counters in step with the note
+            super().save(*args, **kwargs)
+
 
 class Translation(CreateUpdateModelBase):
     '''
@@ -198,3 +465,76 @@ class Translation(CreateUpdateModelBase):
 
     def __str__(self):
         return str(self.note) + " - " + self.language
+
+
+class Webhook(CreateUpdateModelBase):
+    '''
+    An endpoint that is notified when a release is published.  Leave the project blank to receive events for all projects.
+    '''
+    uuid = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
+    name = models.CharField(_("Name"), max_length=80, blank=False)
+    url = models.URLField(_("URL"), max_length=500)
+    secret = models.CharField(_("Secret"), max_length=128, blank=True, help_text="Used to sign the payload with HMAC-SHA256")
+    project = models.ForeignKey(Project, verbose_name=_("Project"), on_delete=models.CASCADE, related_name="webhooks", blank=True, null=True)
+    enabled = models.BooleanField(_("Enabled"), default=True)
+
+    class Meta:
+        verbose_name = _("Webhook")
+        verbose_name_plural = _("Webhooks")
+
+    def __str__(self):
+        return self.name
+
+
+class OutboxMessageManager(models.Manager):
+
+    def queue_releases_published(self, releases):
+        '''
+        Write one outbox row per release and matching webhook.  Call this inside the transaction that publishes the releases.
+        '''
+        webhooks = list(Webhook.objects.filter(enabled=True, deleted=False))
+        messages = []
+
+        for release in releases:
+            payload = {"event": OutboxMessage.EVENT_RELEASE_PUBLISHED, "release": release.get_webhook_payload()}
+            messages += [self.model(webhook=webhook, release=release, event=payload["event"], payload=payload)
+                         for webhook in webhooks if webhook.project_id in (None, release.project_id)]
+
+        return self.bulk_create(messages)
+
+    def due(self, now=None):
+        return self.filter(status=OutboxMessage.Status.PENDING, next_attempt__lte=now or timezone.now())
+
+
+class OutboxMessage(CreateUpdateModelBase):
+    '''
+    Transactional outbox for webhook deliveries.  Rows are written when a release is published and drained by the
+    ``deliver_webhooks`` management command.
+    '''
+    EVENT_RELEASE_PUBLISHED = "release.published"
+
+    class Status(models.IntegerChoices):
+        PENDING = 0, _("Pending")
+        DELIVERED = 10, _("Delivered")
+        FAILED = 20, _("Failed")
+
+    uuid = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
+    webhook = models.ForeignKey(Webhook, verbose_name=_("Webhook"), on_delete=models.CASCADE, related_name="messages")
+    release = models.ForeignKey(Release, verbose_name=_("Release"), on_delete=models.SET_NULL, related_name="outbox_messages", blank=True, null=True)
+    event = models.CharField(_("Event"), max_length=50)
+    payload = models.JSONField(_("Payload"))
+    status = models.IntegerField(_("Status"), default=Status.PENDING, choices=Status.choices)
+    attempts = models.PositiveIntegerField(_("Attempts"), default=0)
+    next_attempt = models.DateTimeField(_("Next Attempt"), default=timezone.now)
+    delivered = models.DateTimeField(_("Delivered"), blank=True, null=True)
+    last_error = models.TextField(_("Last Error"), blank=True)
+
+    objects = OutboxMessageManager()
+
+    class Meta:
+        verbose_name = _("Outbox Message")
+        verbose_name_plural = _("Outbox Messages")
+        indexes = [models.Index(fields=["status", "next_attempt"])]
+
+    def __str__(self):
+        return "{} - {}".format(self.event, self.webhook)
@@ -0,0 +1,113 @@
+'''
+Optional database routing for the release notes app.  Add the router and the middleware to your settings and name the
+replica alias:
+
+    DATABASE_ROUTERS = ['releasenotes.routers.ReleaseNotesRouter']
+    MIDDLEWARE += ['releasenotes.routers.StickyPrimaryMiddleware']
+    RELEASENOTES_READ_DATABASE = 'replica'
+
+Only reads made inside ``read_from_replica()`` go to the replica, which the public views do.  Everything else, including
+the admin and the management commands, stays on the primary.
+'''
+import contextvars
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+from releasenotes import config
+
+APP_LABEL = "releasenotes"
+
+_use_replica = contextvars.ContextVar("releasenotes_use_replica", default=False)
+_wrote = contextvars.ContextVar("releasenotes_wrote", default=False)
+
+
+@contextmanager
+def read_from_replica(enabled=True):
+    '''
+    Send the app's reads to the replica for the duration of the block.
+    '''
+    token = _use_replica.set(enabled)
+    try:
+        yield
+    finally:
+        _use_replica.reset(token)
+
+
+def mark_written():
+    _wrote.set(True)
+
+
+def is_sticky(request):
+    return bool(request.COOKIES.get(config.STICKY_COOKIE))
+
+
+class ReleaseNotesRouter:
+    '''
+    Writes go to the primary, reads go to the replica when asked for by ``read_from_replica()``.
+    '''
+
+    def __init__(self):
+        self.write_database = getattr(settings, "RELEASENOTES_WRITE_DATABASE", DEFAULT_DB_ALIAS)
+        self.read_database = getattr(settings, "RELEASENOTES_READ_DATABASE", None)
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label != APP_LABEL:
+            return None
+        if self.read_database and _use_replica.get():
+            return self.read_database
+        return self.write_database
+
+    def db_for_write(self, model, **hints):
+        if model._meta.app_label != APP_LABEL:
+            return None
+        return self.write_database
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {self.write_database, self.read_database}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if app_label == APP_LABEL and self.read_database and db == self.read_database:
+            return False        # The replica gets its schema from the primary
+        return None
+
+
+class ReplicaReadMixin:
+    '''
+    View mixin that serves safe requests from the replica, unless the visitor recently saved something as staff.
+    '''
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method not in ("GET", "HEAD") or is_sticky(request):
+            return super().dispatch(request, *args, **kwargs)
+
+        with read_from_replica():
+            response = super().dispatch(request, *args, **kwargs)
+            if hasattr(response, "render"):
+                response.render()       # Templates are rendered lazily, make sure their queries use the replica too
+        return response
+
+
+class StickyPrimaryMiddleware:
+    '''
+    Read-your-writes: after a staff request changes release notes data, keep that browser on the primary for a while
+    so it does not read stale data from a lagging replica.
+    '''
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = _wrote.set(False)
+        try:
+            response = self.get_response(request)
+            user = getattr(request, "user", None)
+            if _wrote.get() and user is not None and user.is_staff:
+                response.set_cookie(config.STICKY_COOKIE, "1", max_age=config.STICKY_SECONDS, httponly=True, samesite="Lax")
+        finally:
+            _wrote.reset(token)
+        return response
@@ -0,0 +1,163 @@
+import contextvars
+
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import transaction
+from django.db.models import Case, F, Q, Value, When
+from django.db.models.signals import post_save, post_delete, pre_delete
+from django.dispatch import receiver
+
+from releasenotes.cache import bump_generation, bump_sitemap_generation
+from releasenotes.models import Project, Release, Audience, Note, Translation
+from releasenotes.routers import APP_LABEL, mark_written
+
+
+###
+# CASCADING DELETES
+###
+
+# Projects and releases whose delete is in progress.  Their cascading children skip the per-row work, the parent's own
+# post_delete covers it.
+_deleting_projects = contextvars.ContextVar("releasenotes_deleting_projects", default=frozenset())
+_deleting_releases = contextvars.ContextVar("releasenotes_deleting_releases", default=frozenset())
+
+
+@receiver(pre_delete, sender=Project)
+def start_deleting_project(sender, instance, **kwargs):
+    _deleting_projects.set(_deleting_projects.get() | {instance.pk})
+
+
+@receiver(post_delete, sender=Project)
+def finish_deleting_project(sender, instance, **kwargs):
+    _deleting_projects.set(_deleting_projects.get() - {instance.pk})
+
+
+@receiver(pre_delete, sender=Release)
+def start_deleting_release(sender, instance, **kwargs):
+    _deleting_releases.set(_deleting_releases.get() | {instance.pk})
+
+
+@receiver(post_delete, sender=Release)
+def finish_deleting_release(sender, instance, **kwargs):
+    _deleting_releases.set(_deleting_releases.get() - {instance.pk})
+
+
+def parent_is_being_deleted(instance):
+    if isinstance(instance, Note):
+        return instance.release_id in _deleting_releases.get()
+    if isinstance(instance, (Release, Audience)):
+        return instance.project_id in _deleting_projects.get()
+    return False
+
+
+###
+# CACHE INVALIDATION
+###
+
+def get_project(instance):
+    if isinstance(instance, Project):
+        return instance
+    if isinstance(instance, Note):
+        return instance.release.project
+    if isinstance(instance, Translation):
+        return instance.note.release.project
+    return instance.project
+
+
+@receiver(post_save, sender=Project)
+@receiver(post_save, sender=Release)
+@receiver(post_save, sender=Audience)
+@receiver(post_save, sender=Note)
+@receiver(post_save, sender=Translation)
+@receiver(post_delete, sender=Project)
+@receiver(post_delete, sender=Release)
+@receiver(post_delete, sender=Audience)
+@receiver(post_delete, sender=Note)
+@receiver(post_delete, sender=Translation)
+def invalidate_project_pages(sender, instance, **kwargs):
+    '''
+    Any change to a project or its content invalidates the project's cached pages.  The bump waits for the commit,
+    otherwise a request in between could cache the old rows under the new generation.
+    '''
+    if parent_is_being_deleted(instance):
+        return
+    try:
+        project_slug = get_project(instance).slug
+    except ObjectDoesNotExist:      # The parent is already gone in a cascading delete
+        return
+    transaction.on_commit(lambda: bump_generation(project_slug))
+
+
+@receiver(post_save, sender=Project)
+@receiver(post_save, sender=Release)
+@receiver(post_delete, sender=Project)
+@receiver(post_delete, sender=Release)
+def invalidate_sitemaps(sender, instance, **kwargs):
+    if parent_is_being_deleted(instance):
+        return
+    transaction.on_commit(bump_sitemap_generation)
+
+
+###
+# DENORMALIZED COUNTERS
+###
+
+def add_note(release_id, note_type, delta):
+    field = Note.COUNTER_FIELDS.get(note_type)
+    if release_id is not None and field:
+        Release.objects.filter(pk=release_id).update(**{field: F(field) + delta})
+
+
+def add_release(project_id, published_date):
+    newer = Q(latest_release_date__isnull=True) | Q(latest_release_date__lt=published_date)
+    Project.objects.filter(pk=project_id).update(
+        release_count=F("release_count") + 1,
+        latest_release_date=Case(When(newer, then=Value(published_date)), default=F("latest_release_date")),
+    )
+
+
+def recount_releases(*project_ids):
+    Project.objects.filter(pk__in=project_ids).recount_releases()      # The latest date has to be looked up again anyway
+
+
+@receiver(post_save, sender=Note)
+def count_saved_note(sender, instance, created, **kwargs):
+    if created:
+        add_note(instance.release_id, instance.note_type, 1)
+    elif instance.has_changed("release_id") or instance.has_changed("note_type"):
+        add_note(instance.get_loaded_value("release_id"), instance.get_loaded_value("note_type"), -1)
+        add_note(instance.release_id, instance.note_type, 1)
+
+
+@receiver(post_delete, sender=Note)
+def count_deleted_note(sender, instance, **kwargs):
+    if parent_is_being_deleted(instance):
+        return
+    add_note(instance.get_loaded_value("release_id", instance.release_id), instance.get_loaded_value("note_type", instance.note_type), -1)
+
+
+@receiver(post_save, sender=Release)
+def count_saved_release(sender, instance, created, **kwargs):
+    if created:
+        if instance.is_published():     # Unpublished releases are not counted until they go live
+            add_release(instance.project_id, instance.published_date)
+    elif instance.has_changed("project_id"):
+        recount_releases(instance.get_loaded_value("project_id"), instance.project_id)
+    elif instance.has_changed("state") or instance.has_changed("publish_at"):
+        recount_releases(instance.project_id)
+
+
+@receiver(post_delete, sender=Release)
+def count_deleted_release(sender, instance, **kwargs):
+    if parent_is_being_deleted(instance):
+        return
+    recount_releases(instance.project_id)
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def track_writes(sender, **kwargs):
+    '''
+    Lets the sticky primary middleware know that the current request changed release notes data.
+    '''
+    if sender._meta.app_label == APP_LABEL:
+        mark_written()
@@ -0,0 +1,115 @@
+'''
+Sitemaps for the public project and release pages.  Hook them up in your root urls:
+
+    from django.contrib.sitemaps import views as sitemap_views
+    from releasenotes.sitemaps import sitemaps
+
+    path('sitemap.xml', sitemap_views.index, {'sitemaps': sitemaps, 'sitemap_url_name': 'sitemaps'}, name='sitemap-index'),
+    path('sitemap-<section>.xml', sitemap_views.sitemap, {'sitemaps': sitemaps}, name='sitemaps'),
+'''
+from django.conf import settings
+from django.contrib.sitemaps import Sitemap
+from django.core.paginator import Paginator
+from django.db.models import Max, Q
+from django.db.models.functions import Coalesce, Greatest
+from django.urls import reverse
+from django.utils import timezone
+
+from releasenotes import cache, config
+from releasenotes.models import Project, Release
+from releasenotes.routers import read_from_replica
+
+
+class IteratorPaginator(Paginator):
+    '''
+    Streams each page from the database instead of caching the page's rows on the queryset.
+    '''
+
+    def _get_page(self, object_list, *args, **kwargs):
+        if hasattr(object_list, "iterator"):
+            object_list = object_list.iterator()
+        return super()._get_page(object_list, *args, **kwargs)
+
+
+class CachedSitemap(Sitemap):
+    '''
+    Items are ``values_list`` rows so no model instances are created.  The URL count and every page of URLs are cached
+    until the sitemap generation is bumped by a save or delete signal.
+    '''
+    limit = config.SITEMAP_LIMIT
+    section = None
+
+    def get_cache_timeout(self):
+        return config.SITEMAP_CACHE_TIMEOUT
+
+    def read_from_replica(self):
+        # Right after a change the replica may lag behind, and what is read now stays cached for a long time
+        return read_from_replica(not cache.sitemap_recently_bumped())
+
+    @property
+    def paginator(self):
+        paginator = IteratorPaginator(self.items(), self.limit)
+        key = cache.sitemap_key(self.section, "count")
+        count = cache.get_cache().get(key)
+
+        if count is None:
+            with self.read_from_replica():
+                count = paginator.count
+            cache.get_cache().set(key, count, self.get_cache_timeout())
+
+        paginator.count = count     # Overrides the cached_property, so the COUNT query only runs on a cache miss
+        return paginator
+
+    def get_urls(self, page=1, site=None, protocol=None):
+        key = cache.sitemap_key(self.section, getattr(site, "domain", ""), protocol, page)
+        cached = cache.get_cache().get(key)
+
+        if cached is None:
+            with self.read_from_replica():
+                urls = super().get_urls(page=page, site=site, protocol=protocol)
+            cached = (urls, getattr(self, "latest_lastmod", None))
+            cache.get_cache().set(key, cached, self.get_cache_timeout())
+
+        urls, latest_lastmod = cached
+        if latest_lastmod is not None:
+            self.latest_lastmod = latest_lastmod
+        return urls
+
+
+class ProjectSitemap(CachedSitemap):
+    section = "projects"
+
+    def items(self):
+        # The project page lists its releases, which change through .update() without touching Project.updated
+        published = Q(releases__state__in=[Release.ReleaseState.CURRENT, Release.ReleaseState.PREVIOUS]) | Q(releases__state=Release.ReleaseState.FUTURE, releases__publish_at__lte=timezone.now())
+        latest_release = Max("releases__updated", filter=published & Q(releases__deleted=False))
+        return Project.on_site.filter(deleted=False).annotate(lastmod=Greatest("updated", Coalesce(latest_release, "updated"))).order_by("pk").values_list("slug", "lastmod")
+
+    def location(self, item):
+        return reverse("releasenotes:project-details", kwargs={"project_slug": item[0]})
+
+    def lastmod(self, item):
+        return item[1]
+
+
+class ReleaseSitemap(CachedSitemap):
+    section = "releases"
+
+    def get_cache_timeout(self):
+        # Scheduled releases appear when they are published, so don't keep the pages past that
+        return cache.get_timeout(Release.objects.next_publish_at(), timeout=config.SITEMAP_CACHE_TIMEOUT)
+
+    def items(self):
+        return Release.objects.published().filter(deleted=False, project__deleted=False, project__site=settings.SITE_ID).order_by("pk").values_list("slug", "project__slug", "updated")
+
+    def location(self, item):
+        return reverse("releasenotes:release-details", kwargs={"release_slug": item[0], "project_slug": item[1]})
+
+    def lastmod(self, item):
+        return item[2]
+
+
+sitemaps = {
+    ProjectSitemap.section: ProjectSitemap,
+    ReleaseSitemap.section: ReleaseSitemap,
+}
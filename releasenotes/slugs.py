@@ -0,0 +1,75 @@
+import re
+
+from django.db import IntegrityError, transaction
+
+
+def allocate_slug(queryset, base, max_length=50, field="slug", fallback="item"):
+    '''
+    Returns ``base`` or, if it is taken in the queryset, ``base-N`` with the lowest free N.  All the candidates are
+    fetched with a single prefix query instead of probing one suffix at a time.
+    '''
+    base = (base or fallback)[:max_length]
+
+    while True:
+        taken = set(queryset.filter(**{field + "__startswith": base}).values_list(field, flat=True))
+        if base not in taken:
+            return base
+
+        pattern = re.compile(r"^{}-(\d+)$".format(re.escape(base)))
+        used = {int(match.group(1)) for match in map(pattern.match, taken) if match}
+        number = 2
+        while number in used:
+            number += 1
+
+        suffix = "-{}".format(number)
+        if len(base) + len(suffix) <= max_length:
+            return base + suffix
+
+        base = base[:max_length - len(suffix)]      # Trimmed prefixes can collide with other slugs, so look again
+
+
+class UniqueSlugMixin:
+    '''
+    Keeps ``slug`` unique within ``slug_scope``.  Subclasses provide ``get_slug_source()``.  The slug is only allocated
+    when one of the source or scope fields changed (tracked by TrackedFieldsMixin).  A concurrent insert that grabs the
+    same slug trips the unique constraint, in which case a new slug is allocated and the save retried.  Any other
+    integrity error is raised as is.
+    '''
+    slug_source_fields = ("name",)
+    slug_scope = ()
+    slug_retries = 3
+
+    def slug_needs_update(self):
+        return not self.slug or any(self.has_changed(name) for name in self.slug_source_fields + self.slug_scope)
+
+    def get_slug_queryset(self):
+        queryset = type(self)._default_manager.filter(**{name: getattr(self, name) for name in self.slug_scope})
+        if self.pk is not None:
+            queryset = queryset.exclude(pk=self.pk)
+        return queryset
+
+    def allocate_slug(self):
+        max_length = self._meta.get_field("slug").max_length
+        return allocate_slug(self.get_slug_queryset(), self.get_slug_source(), max_length, fallback=self._meta.model_name)
+
+    def slug_is_taken(self):
+        return self.get_slug_queryset().filter(slug=self.slug).exists()
+
+    def save(self, *args, **kwargs):
+        if not self.slug_needs_update():
+            return super().save(*args, **kwargs)
+
+        previous_slug = self.slug
+        update_fields = kwargs.get("update_fields")
+
+        for attempt in range(self.slug_retries):
+            self.slug = self.allocate_slug()
+            if update_fields is not None and self.slug != previous_slug:
+                kwargs["update_fields"] = set(update_fields) | {"slug"}
+            try:
+                with transaction.atomic():
+                    return super().save(*args, **kwargs)
+            except IntegrityError:
+                # The savepoint is rolled back, so the lookup can tell a slug conflict apart from other errors
+                if attempt + 1 == self.slug_retries or not self.slug_is_taken():
+                    raise
@@ -1,3 +1,554 @@
-from django.test import TestCase
+import gzip
+import json
+import threading
+import time
+from io import StringIO
+from unittest import mock
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, HTTPServer
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError, connection, router, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from releasenotes.cache import bump_generation, CachedPage, PageStore, get_generation, get_sitemap_generation, get_timeout, page_store
+from releasenotes.compression import choose_encoding, minify_html
+from releasenotes import config
+from releasenotes.models import get_patch_key, Project, Release, Audience, Note, Webhook, OutboxMessage
+from releasenotes.routers import read_from_replica
+from releasenotes.sitemaps import ProjectSitemap, ReleaseSitemap
+from releasenotes.views import encode_cursor
+from releasenotes.webhooks import drain_outbox, sign_payload, SIGNATURE_HEADER
+
+
+class StubWebhookHandler(BaseHTTPRequestHandler):
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        self.server.received.append((dict(self.headers), body))
+        response = self.server.responses.pop(0) if self.server.responses else 200
+        if isinstance(response, bytes):     # A raw, possibly malformed, response
+            self.wfile.write(response)
+            return
+        self.send_response(response)
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class WebhookOutboxTestCase(TestCase):
+
+    def setUp(self):
+        self.server = HTTPServer(("127.0.0.1", 0), StubWebhookHandler)
+        self.server.received = []
+        self.server.responses = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+        self.project = Project.objects.create(name="Example App")
+        self.webhook = Webhook.objects.create(name="Stub", url="http://127.0.0.1:{}/hook/".format(self.server.server_port), secret="s3cret")
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_publishing_writes_outbox(self):
+        release = Release.objects.create(project=self.project, major=1, minor=0, state=Release.ReleaseState.FUTURE)
+        self.assertFalse(OutboxMessage.objects.exists())
+
+        release.state = Release.ReleaseState.CURRENT
+        release.save()
+        release.save()      # Saving an already current release should not queue it again
+        self.assertEqual(OutboxMessage.objects.count(), 1)
+
+    def test_deliver_signed_payload(self):
+        Release.objects.create(project=self.project, major=1, minor=2)
+
+        self.assertEqual(drain_outbox(workers=2), (1, 0))
+        headers, body = self.server.received[0]
+        self.assertEqual(headers[SIGNATURE_HEADER], sign_payload("s3cret", body))
+        self.assertEqual(json.loads(body)["release"]["version"], "1.2")
+        self.assertEqual(json.loads(body)["release"]["url"], "https://example.com/release/example-app/v1.2/")
+        self.assertEqual(OutboxMessage.objects.get().status, OutboxMessage.Status.DELIVERED)
+
+    def test_failed_delivery_is_retried_later(self):
+        self.server.responses = [500]
+        Release.objects.create(project=self.project, major=1, minor=3)
+
+        self.assertEqual(drain_outbox(), (0, 1))
+        message = OutboxMessage.objects.get()
+        self.assertEqual(message.status, OutboxMessage.Status.PENDING)
+        self.assertEqual(message.attempts, 1)
+        self.assertEqual(message.last_error, "HTTP 500")
+
+        OutboxMessage.objects.update(next_attempt=message.created)
+        self.assertEqual(drain_outbox(), (1, 0))
+        self.assertEqual(len(self.server.received), 2)
+
+    def test_malformed_response_is_recorded(self):
+        self.server.responses = [b"NOT-HTTP garbage\r\n\r\n"]
+        Release.objects.create(project=self.project, major=1, minor=5)
+        Release.objects.create(project=self.project, major=1, minor=6)
+
+        self.assertEqual(drain_outbox(workers=1), (1, 1))
+        failed = OutboxMessage.objects.get(status=OutboxMessage.Status.PENDING)
+        self.assertEqual(failed.attempts, 1)
+        self.assertIn("BadStatusLine", failed.last_error)
+        self.assertEqual(OutboxMessage.objects.filter(status=OutboxMessage.Status.DELIVERED).count(), 1)
+
+    def test_failed_after_max_attempts(self):
+        self.server.responses = [500]
+        Release.objects.create(project=self.project, major=1, minor=4)
+
+        drain_outbox(max_attempts=1)
+        self.assertEqual(OutboxMessage.objects.get().status, OutboxMessage.Status.FAILED)
+
+
+class ScheduledPublishingTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.project = Project.objects.create(name="Example App")
+        self.current = Release.objects.create(project=self.project, major=1, minor=0)
+        self.future = Release.objects.create(project=self.project, major=1, minor=1, state=Release.ReleaseState.FUTURE, publish_at=timezone.now() + timedelta(hours=1))
+
+    def test_published_hides_future_releases(self):
+        self.assertEqual(list(Release.objects.published()), [self.current])
+        self.assertEqual(Release.objects.published(timezone.now() + timedelta(hours=2)).count(), 2)
+
+    def test_publish_due(self):
+        self.assertEqual(Release.objects.publish_due(), [])
+        self.assertEqual(Release.objects.publish_due(timezone.now() + timedelta(hours=2)), [self.future.pk])
+
+        self.current.refresh_from_db()
+        self.future.refresh_from_db()
+        self.assertEqual(self.current.state, Release.ReleaseState.PREVIOUS)
+        self.assertEqual(self.future.state, Release.ReleaseState.CURRENT)
+
+    def test_saving_current_demotes_previous_current(self):
+        newer = Release.objects.create(project=self.project, major=1, minor=2)
+        self.assertEqual(list(Release.objects.filter(state=Release.ReleaseState.CURRENT)), [newer])
+
+        self.current.refresh_from_db()
+        self.current.state = Release.ReleaseState.CURRENT
+        self.current.save()
+        newer.refresh_from_db()
+        self.assertEqual(newer.state, Release.ReleaseState.PREVIOUS)
+
+    def test_timeout_expires_at_next_publish(self):
+        now = timezone.now()
+        self.assertEqual(get_timeout(now + timedelta(seconds=90), now=now, timeout=3600), 90)
+        self.assertEqual(get_timeout(now + timedelta(hours=2), now=now, timeout=3600), 3600)
+        self.assertEqual(get_timeout(None, timeout=3600), 3600)
+
+
+
+class PageInvalidationTestCase(TransactionTestCase):
+    '''
+    Invalidation happens on commit, which only fires outside of TestCase's wrapping transaction.
+    '''
+
+    def setUp(self):
+        cache.clear()
+        self.project = Project.objects.create(name="Example App")
+        self.current = Release.objects.create(project=self.project, major=1, minor=0)
+        self.future = Release.objects.create(project=self.project, major=1, minor=1, state=Release.ReleaseState.FUTURE, publish_at=timezone.now() + timedelta(hours=1))
+
+    def test_project_page_is_cached(self):
+        url = self.project.get_absolute_url()
+        response = self.client.get(url)
+        self.assertContains(response, self.current.version_name)
+        self.assertNotContains(response, self.future.version_name)
+        self.assertLessEqual(int(response["Cache-Control"].split("=")[1]), 3600)
+
+        with self.assertNumQueries(0):
+            self.client.get(url)
+
+        self.current.name = "Renamed"
+        self.current.save()     # Invalidates the project's cached pages
+        self.assertContains(self.client.get(url), "Renamed")
+
+    def test_generation_bumped_after_commit(self):
+        generation = get_generation(self.project.slug)
+
+        with transaction.atomic():
+            self.current.name = "Renamed"
+            self.current.save()
+            self.assertEqual(get_generation(self.project.slug), generation)
+
+        self.assertNotEqual(get_generation(self.project.slug), generation)
+
+
+@override_settings(
+    DATABASE_ROUTERS=["releasenotes.routers.ReleaseNotesRouter"],
+    RELEASENOTES_READ_DATABASE="replica",
+    MIDDLEWARE=settings.MIDDLEWARE + ["releasenotes.routers.StickyPrimaryMiddleware"],
+)
+class ReplicaRoutingTestCase(TestCase):
+    databases = {"default", "replica"}
+
+    def setUp(self):
+        cache.clear()
+        self.project = Project.objects.create(name="Example App")
+        Project.objects.using("replica").create(pk=self.project.pk, uuid=self.project.uuid, name="Example App", slug="example-app", site_id=settings.SITE_ID)
+        self.staff = User.objects.create_user("staff", password="password", is_staff=True, is_superuser=True)
+
+    def test_router(self):
+        self.assertEqual(router.db_for_write(Project), "default")
+        self.assertEqual(router.db_for_read(Project), "default")
+        with read_from_replica():
+            self.assertEqual(router.db_for_read(Project), "replica")
+            self.assertEqual(router.db_for_write(Project), "default")
+            self.assertEqual(router.db_for_read(User), "default")
+
+    def test_public_reads_use_replica(self):
+        Project.objects.filter(pk=self.project.pk).update(name="Primary Only")
+        self.assertContains(self.client.get(self.project.get_absolute_url()), "Example App")
+
+    def test_lagging_replica_is_not_cached(self):
+        Project.objects.filter(pk=self.project.pk).update(name="Primary Only")
+        bump_generation(self.project.slug)      # What the commit of the change does
+
+        self.assertContains(self.client.get(self.project.get_absolute_url()), "Primary Only")
+        with self.assertNumQueries(0, using="replica"), self.assertNumQueries(0):
+            self.assertContains(self.client.get(self.project.get_absolute_url()), "Primary Only")      # The cached copy
+
+    def test_staff_save_sticks_to_primary(self):
+        self.client.force_login(self.staff)
+        response = self.client.post("/admin/releasenotes/project/{}/change/".format(self.project.pk), {"name": "Example App", "site": settings.SITE_ID, "deleted": ""})
+        self.assertEqual(response.status_code, 302)
+        self.assertIn(config.STICKY_COOKIE, response.cookies)
+
+        Project.objects.filter(pk=self.project.pk).update(name="Primary Only")
+        self.assertContains(self.client.get(self.project.get_absolute_url()), "Primary Only")
+
+
+class SitemapTestCase(TransactionTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.project = Project.objects.create(name="Example App")
+        self.release = Release.objects.create(project=self.project, major=1, minor=0)
+        Release.objects.create(project=self.project, major=2, minor=0, state=Release.ReleaseState.FUTURE, publish_at=timezone.now() + timedelta(days=1))
+
+    def test_index_and_sections(self):
+        response = self.client.get("/sitemap.xml")
+        self.assertContains(response, "/sitemap-projects.xml")
+        self.assertContains(response, "/sitemap-releases.xml")
+
+        response = self.client.get("/sitemap-releases.xml")
+        self.assertContains(response, self.release.get_absolute_url())
+        self.assertNotContains(response, "v2.0")
+
+    def test_pagination(self):
+        Release.objects.create(project=self.project, major=1, minor=1)
+
+        sitemap = ReleaseSitemap()
+        sitemap.limit = 1
+        self.assertEqual(sitemap.paginator.num_pages, 2)
+
+    def test_cached_until_changed(self):
+        self.client.get("/sitemap-releases.xml")
+        with self.assertNumQueries(0):
+            self.client.get("/sitemap-releases.xml")
+
+        new_release = Release.objects.create(project=self.project, major=1, minor=1)
+        self.assertContains(self.client.get("/sitemap-releases.xml"), new_release.get_absolute_url())
+
+    def test_project_lastmod_follows_releases(self):
+        Project.objects.update(updated=timezone.now() - timedelta(days=10))
+        self.release.refresh_from_db()
+        self.assertEqual([lastmod for slug, lastmod in ProjectSitemap().items()], [self.release.updated])
+
+        new_release = Release.objects.create(project=self.project, major=1, minor=1)
+        [(slug, lastmod)] = ProjectSitemap().items()
+        self.assertGreaterEqual(lastmod, new_release.updated)      # The demoted release may be stamped a moment later
+
+    def test_generation_bumped_after_commit(self):
+        generation = get_sitemap_generation()
+
+        with transaction.atomic():
+            Release.objects.create(project=self.project, major=1, minor=1)
+            self.assertEqual(get_sitemap_generation(), generation)
+
+        self.assertNotEqual(get_sitemap_generation(), generation)
+
+
+class CounterTestCase(TestCase):
+
+    def setUp(self):
+        self.project = Project.objects.create(name="Example App")
+        self.release = Release.objects.create(project=self.project, major=1, minor=0)
+
+    def assertCounters(self, release, new_features, bug_fixes, known_issues):
+        release.refresh_from_db()
+        self.assertEqual((release.new_feature_count, release.bug_fix_count, release.known_issue_count), (new_features, bug_fixes, known_issues))
+
+    def test_note_counters(self):
+        note = Note.objects.create(release=self.release, note_type=Note.NoteType.NEW_FEATURE, description="Feature")
+        Note.objects.create(release=self.release, note_type=Note.NoteType.KNOWN_ISSUES, description="Issue")
+        self.assertCounters(self.release, 1, 0, 1)
+
+        note.note_type = Note.NoteType.BUG_FIX
+        note.save()
+        note.save()
+        self.assertCounters(self.release, 0, 1, 1)
+
+        note.delete()
+        self.assertCounters(self.release, 0, 0, 1)
+
+    def test_release_delete_skips_note_counters(self):
+        for i in range(3):
+            Note.objects.create(release=self.release, note_type=Note.NoteType.BUG_FIX, description="Fix")
+        with CaptureQueriesContext(connection) as queries:
+            self.release.delete()
+        self.assertFalse([query for query in queries if query["sql"].startswith('UPDATE "releasenotes_release"')])
+        self.assertFalse([query for query in queries if query["sql"].startswith('SELECT "releasenotes_release"')])
+
+        # A later note delete is counted again
+        release = Release.objects.create(project=self.project, major=1, minor=1)
+        note = Note.objects.create(release=release, note_type=Note.NoteType.BUG_FIX, description="Fix")
+        note.delete()
+        self.assertCounters(release, 0, 0, 0)
+
+    def test_project_delete_skips_release_counters(self):
+        for minor in range(1, 6):
+            Release.objects.create(project=self.project, major=1, minor=minor)
+        with CaptureQueriesContext(connection) as queries:
+            self.project.delete()
+        self.assertFalse([query for query in queries if query["sql"].startswith('UPDATE "releasenotes_project"')])
+        self.assertFalse([query for query in queries if query["sql"].startswith('SELECT "releasenotes_project"')])
+
+    def test_project_counters(self):
+        second = Release.objects.create(project=self.project, major=1, minor=1)
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.release_count, 2)
+        self.assertEqual(self.project.latest_release_date, second.created)
+
+        second.delete()
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.release_count, 1)
+        self.assertEqual(self.project.latest_release_date, self.release.created)
+
+    def test_only_published_releases_are_counted(self):
+        Release.objects.filter(pk=self.release.pk).update(created=timezone.now() - timedelta(days=2))
+        Project.objects.recount_releases()
+        self.release.refresh_from_db()
+        publish_at = timezone.now() + timedelta(days=1)
+        future = Release.objects.create(project=self.project, major=2, minor=0, state=Release.ReleaseState.FUTURE, publish_at=publish_at)
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.release_count, 1)
+        self.assertEqual(self.project.latest_release_date, self.release.created)
+
+        Release.objects.filter(pk=future.pk).update(publish_at=timezone.now() - timedelta(minutes=1))
+        Release.objects.publish_due()
+        future.refresh_from_db()
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.release_count, 2)
+        self.assertEqual(self.project.latest_release_date, future.publish_at)
+
+        future.state = Release.ReleaseState.FUTURE
+        future.publish_at = publish_at
+        future.save()
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.release_count, 1)
+
+    def test_repair(self):
+        Note.objects.create(release=self.release, note_type=Note.NoteType.BUG_FIX, description="Fix")
+        Release.objects.update(bug_fix_count=0)
+        Project.objects.update(release_count=0, latest_release_date=None)
+
+        call_command("repair_counters", stdout=StringIO())
+        self.assertCounters(self.release, 0, 1, 0)
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.release_count, 1)
+        self.assertEqual(self.project.latest_release_date, self.release.created)
+
+
+class SlugTestCase(TestCase):
+
+    def test_collisions_get_suffixes(self):
+        slugs = [Project.objects.create(name="Example App").slug for i in range(4)]
+        self.assertEqual(slugs, ["example-app", "example-app-2", "example-app-3", "example-app-4"])
+
+        project = Project.objects.get(slug="example-app")
+        Audience.objects.create(name="Team", project=project)
+        self.assertEqual(Audience.objects.create(name="Team", project=project).slug, "team-2")
+
+        Release.objects.create(project=project, major=1, minor=0)
+        self.assertEqual(Release.objects.create(project=project, major=1, minor=0).slug, "v1.0-2")
+
+    def test_one_query_per_allocation(self):
+        for i in range(5):
+            Project.objects.create(name="Example App")
+        project = Project(name="Example App")
+        with self.assertNumQueries(4):      # The prefix lookup and the insert wrapped in a savepoint
+            project.save()
+        self.assertEqual(project.slug, "example-app-6")
+
+    def test_unchanged_source_skips_allocation(self):
+        project = Project.objects.create(name="Example App")
+        project = Project.objects.get(pk=project.pk)
+        with self.assertNumQueries(1):
+            project.save()
+
+        project.name = "Renamed App"
+        project.save()
+        self.assertEqual(project.slug, "renamed-app")
+
+    def test_retry_on_integrity_error(self):
+        Project.objects.create(name="Example App")
+        project = Project(name="Example App")
+        real_queryset = project.get_slug_queryset
+
+        # The first allocation misses the existing row, like a concurrent insert would
+        with mock.patch.object(Project, "get_slug_queryset", side_effect=[Project.objects.none(), real_queryset(), real_queryset()]):
+            project.save()
+        self.assertEqual(project.slug, "example-app-2")
+
+    def test_other_integrity_errors_are_not_retried(self):
+        project = Project(name=None)
+        with mock.patch.object(Project, "allocate_slug", autospec=True, side_effect=Project.allocate_slug) as allocate:
+            with self.assertRaises(IntegrityError):
+                project.save()
+        self.assertEqual(allocate.call_count, 1)
+
+    def test_slug_added_to_update_fields(self):
+        project = Project.objects.create(name="Example App")
+        project.name = "Renamed App"
+        project.save(update_fields=["name"])
+        project.refresh_from_db()
+        self.assertEqual(project.slug, "renamed-app")
+
+
+class ProjectPaginationTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.project = Project.objects.create(name="Example App")
+        self.releases = [Release.objects.create(project=self.project, major=1, minor=minor, state=Release.ReleaseState.PREVIOUS) for minor in range(5)]
+        self.current = Release.objects.create(project=self.project, major=2, minor=0, name="Current")
+        Note.objects.create(release=self.current, note_type=Note.NoteType.BUG_FIX, description="Fixed the thing")
+        self.staff = User.objects.create_user("staff", password="password")
+        self.client.force_login(self.staff)       # Logged in users skip the page cache
+
+    def get_versions(self, response):
+        return [release.version_number for release in response.context["releases"]]
+
+    @mock.patch("releasenotes.views.ReleaseNotesProjectView.paginate_by", 2)
+    def test_keyset_pages(self):
+        url = self.project.get_absolute_url()
+        response = self.client.get(url)
+        self.assertEqual(self.get_versions(response), ["2.0", "1.4"])
+        self.assertIsNone(response.context["previous_cursor"])
+
+        response = self.client.get(url, {"after": response.context["next_cursor"]})
+        self.assertEqual(self.get_versions(response), ["1.3", "1.2"])
+
+        last = self.client.get(url, {"after": response.context["next_cursor"]})
+        self.assertEqual(self.get_versions(last), ["1.1", "1.0"])
+        self.assertIsNone(last.context["next_cursor"])
+
+        response = self.client.get(url, {"before": last.context["previous_cursor"]})
+        self.assertEqual(self.get_versions(response), ["1.3", "1.2"])
+
+        self.assertEqual(self.client.get(url, {"after": "not-a-cursor"}).status_code, 404)
+        huge = encode_cursor(Release(major=10 ** 30, minor=0, patch_key="", pk=1))
+        self.assertEqual(self.client.get(url, {"after": huge}).status_code, 404)
+        self.assertEqual(self.client.get(url, {"before": huge}).status_code, 404)
+
+    @mock.patch("releasenotes.views.ReleaseNotesProjectView.paginate_by", 2)
+    def test_patches_sort_numerically(self):
+        for patch in ("9", "10", "2-rc1", "2"):
+            Release.objects.create(project=self.project, major=1, minor=4, patch=patch, state=Release.ReleaseState.PREVIOUS)
+
+        url = self.project.get_absolute_url()
+        response = self.client.get(url)
+        self.assertEqual(self.get_versions(response), ["2.0", "1.4.10"])
+        response = self.client.get(url, {"after": response.context["next_cursor"]})
+        self.assertEqual(self.get_versions(response), ["1.4.9", "1.4.2"])
+        response = self.client.get(url, {"after": response.context["next_cursor"]})
+        self.assertEqual(self.get_versions(response), ["1.4.2-rc1", "1.4"])
+
+        self.assertLess(get_patch_key("2rc1"), get_patch_key("2"))
+        self.assertLess(get_patch_key("2"), get_patch_key("2.1"))
+
+    def test_listing_shows_publish_date(self):
+        self.releases[0].publish_at = datetime(2020, 1, 5, tzinfo=timezone.utc)
+        self.releases[0].save()
+        self.assertContains(self.client.get(self.project.get_absolute_url(), {"after": encode_cursor(self.releases[1])}), "Jan. 5, 2020")
+
+    def test_current_release_fragment(self):
+        url = self.project.get_absolute_url()
+        self.assertContains(self.client.get(url), "Fixed the thing")
+
+        with mock.patch("releasenotes.models.Release.get_notes_by_type") as get_notes_by_type:
+            self.assertContains(self.client.get(url), "Fixed the thing")
+        get_notes_by_type.assert_not_called()
+
+        self.assertContains(self.client.get(self.current.get_absolute_url()), "Fixed the thing")
+
+
+class CompressedPageTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        page_store.clear()
+        self.project = Project.objects.create(name="Example App")
+        Release.objects.create(project=self.project, major=1, minor=0)
+
+    def test_serves_gzip_variant(self):
+        url = self.project.get_absolute_url()
+        plain = self.client.get(url)
+        self.assertNotIn("Content-Encoding", plain)
+
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING="gzip, deflate")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", response["Vary"])
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+
+    def test_unknown_query_params_share_the_page(self):
+        url = self.project.get_absolute_url()
+        self.client.get(url)
+        self.client.get(url, {"utm_source": "feed"})
+        self.client.get(url, {"x": "random"})
+        self.assertEqual(len(page_store), 1)
+
+        self.client.get(url, {"after": encode_cursor(Release(major=1, minor=0, patch_key="", pk=1)), "x": "random"})
+        self.assertEqual(len(page_store), 2)
+
+    def test_unknown_project_leaves_no_generation(self):
+        self.assertEqual(self.client.get("/release/no-such-project/").status_code, 404)
+        self.assertIsNone(get_generation("no-such-project", create=False))
+
+        url = self.project.get_absolute_url()
+        self.client.get(url)
+        self.assertIsNotNone(get_generation(self.project.slug, create=False))
+        self.client.get(url)
+        self.assertEqual(len(page_store), 1)
+
+    def test_choose_encoding(self):
+        available = {"identity": b"", "gzip": b"", "br": b""}
+        self.assertEqual(choose_encoding("gzip, br", available), "br")
+        self.assertEqual(choose_encoding("br;q=0, gzip", available), "gzip")
+        self.assertEqual(choose_encoding("*", {"identity": b"", "gzip": b""}), "gzip")
+        self.assertEqual(choose_encoding("", available), "identity")
+
+    def test_minify_keeps_pre_blocks(self):
+        html = "<p>\n    Hello\n    world</p>\n<pre>  keep\n  this</pre>"
+        self.assertEqual(minify_html(html), "<p> Hello world</p> <pre>  keep\n  this</pre>")
+
+    def test_store_stays_within_budget(self):
+        store = PageStore(3000)
+        for i in range(5):
+            store.set("page-{}".format(i), CachedPage({"identity": b"x" * 500}, "text/html", time.time() + 60))
+
+        self.assertLessEqual(store.size, 3000)
+        self.assertIsNone(store.get("page-0"))
+        self.assertIsNotNone(store.get("page-4"))
+        self.assertFalse(store.set("huge", CachedPage({"identity": b"x" * 5000}, "text/html", time.time() + 60)))
@@ -1,32 +1,183 @@
+import base64
+import binascii
+import json
+from urllib.parse import urlencode
+
+from django.http import Http404
+from django.utils.cache import patch_response_headers
 from django.views.generic import TemplateView, DetailView, ListView
 
+from releasenotes import cache, config
+from releasenotes.routers import ReplicaReadMixin, read_from_replica
 from .models import Project, Release
 
-class ReleaseNotesIndexView(ListView):
+
+class CachedPageMixin:
+    """
+    Caches the rendered page for anonymous visitors, precompressed with gzip (and brotli when installed) so each
+    visitor is served the variant their Accept-Encoding allows.  Entries are invalidated by the project's generation
+    and expire when the project's next scheduled release is published.  Only the query parameters in
+    ``cache_query_params`` are part of the key, so tracking or random parameters can't flood the store.
+    """
+    cache_query_params = ()
+
+    def get_cache_project_slug(self):
+        return self.kwargs["project_slug"]
+
+    def get_cache_timeout(self):
+        next_publish_at = Release.objects.filter(project__slug=self.get_cache_project_slug()).next_publish_at()
+        return cache.get_timeout(next_publish_at)
+
+    def get_cache_path(self, request):
+        params = [(name, request.GET[name]) for name in self.cache_query_params if name in request.GET]
+        return request.path + ("?" + urlencode(params) if params else "")
+
+    def is_cacheable(self, request):
+        user = getattr(request, "user", None)
+        return request.method in ("GET", "HEAD") and not (user and user.is_authenticated)
+
+    def render_page(self, request, *args, **kwargs):
+        response = super().dispatch(request, *args, **kwargs)
+        if hasattr(response, "render"):
+            response.render()
+        return response
+
+    def dispatch(self, request, *args, **kwargs):
+        if not self.is_cacheable(request):
+            return super().dispatch(request, *args, **kwargs)
+
+        project_slug = self.get_cache_project_slug()
+        generation = cache.get_generation(project_slug, create=False)
+        key = cache.page_key(project_slug, self.get_cache_path(request), generation) if generation is not None else None
+        page = cache.page_store.get(key) if key else None
+
+        if page is None:
+            if cache.recently_bumped(project_slug):
+                # A lagging replica could still return the rows from before the change, which would then be cached
+                # under the new generation.  Render from the primary until the replica has had time to catch up.
+                with read_from_replica(False):
+                    response = self.render_page(request, *args, **kwargs)
+            else:
+                response = self.render_page(request, *args, **kwargs)
+
+            if response.status_code != 200 or response.streaming:
+                return response
+
+            if key is None:
+                # The project exists now that it rendered, so its generation can be created.  The page itself isn't
+                # stored: a change committed during the render would otherwise be cached under the new generation.
+                cache.get_generation(project_slug)
+                return response
+
+            timeout = self.get_cache_timeout()
+            if not timeout:     # A release goes live right now, don't spend time compressing a page nobody will reuse
+                patch_response_headers(response, 0)
+                return response
+
+            page = cache.CachedPage.from_response(response, timeout)
+            cache.page_store.set(key, page)
+
+        return page.to_response(request)
+
+
+def encode_cursor(release):
+    return base64.urlsafe_b64encode(json.dumps(release.version_key).encode("utf-8")).decode("ascii")
+
+
+CURSOR_INT_RANGE = range(-2 ** 31, 2 ** 31)      # IntegerField and AutoField, larger values overflow the query
+
+
+def decode_cursor(cursor):
+    try:
+        major, minor, patch, pk = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        major, minor, patch, pk = int(major), int(minor), str(patch), int(pk)
+    except (binascii.Error, UnicodeError, ValueError, TypeError, OverflowError):
+        raise Http404("Invalid page")
+
+    if not all(value in CURSOR_INT_RANGE for value in (major, minor, pk)):
+        raise Http404("Invalid page")
+    return major, minor, patch, pk
+
+
+class ReleaseNotesIndexView(ReplicaReadMixin, ListView):
     template_name = "releasenotes/index.html"
     model = Project
 
 
-class ReleaseNotesProjectView(DetailView):
+class ReleaseNotesProjectView(ReplicaReadMixin, CachedPageMixin, DetailView):
     """
-    If a specific release is not provided, default to the current release
+    Shows the current release's notes followed by the project's releases, newest first.  The list is paged with
+    ``after``/``before`` version cursors rather than page numbers so deep pages stay cheap.
     """
     model = Project
     slug_url_kwarg = "project_slug"
+    paginate_by = config.RELEASES_PER_PAGE
+    cache_query_params = ("after", "before")
+    release_fields = ("id", "project_id", "name", "slug", "major", "minor", "patch", "patch_key", "created", "publish_at", "new_feature_count", "bug_fix_count", "known_issue_count")
+
+    def get_releases_queryset(self):
+        return self.object.releases.published().only(*self.release_fields)
+
+    def get_current_release(self):
+        return self.get_releases_queryset().filter(state=Release.ReleaseState.CURRENT).newest_first().first()
+
+    def get_releases_page(self):
+        after = self.request.GET.get("after")
+        before = self.request.GET.get("before")
+        queryset = self.get_releases_queryset()
 
+        if before:
+            queryset = queryset.seek(decode_cursor(before), older=False).oldest_first()
+        else:
+            queryset = queryset.newest_first()
+            if after:
+                queryset = queryset.seek(decode_cursor(after))
 
-class ReleaseNotesDetailView(DetailView):
+        releases = list(queryset[:self.paginate_by + 1])
+        has_more = len(releases) > self.paginate_by
+        releases = releases[:self.paginate_by]
+
+        if before:
+            releases.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, bool(after)
+
+        return {
+            "releases": releases,
+            "is_first_page": not (after or before),
+            "next_cursor": encode_cursor(releases[-1]) if releases and has_next else None,
+            "previous_cursor": encode_cursor(releases[0]) if releases and has_previous else None,
+        }
+
+    def get_context_data(self, *args, **kwargs):
+        context = super().get_context_data(*args, **kwargs)
+        context.update(self.get_releases_page())
+
+        if context["is_first_page"]:
+            # Only evaluated by the template when the cached fragment is missing
+            context["current_release"] = self.get_current_release
+            context["fragment_generation"] = cache.get_generation(self.object.slug)
+            context["fragment_timeout"] = self.get_cache_timeout()
+
+        return context
+
+
+class ReleaseNotesDetailView(ReplicaReadMixin, CachedPageMixin, DetailView):
     """
     If a specific release is not provided, default to the current release
     """
     model = Release
     slug_url_kwarg = "release_slug"
 
+    def get_queryset(self):
+        # Evaluated per request so the publish time is checked against now
+        return Release.objects.published().filter(project__slug=self.kwargs["project_slug"])
+
     def get_context_data(self, *args, **kwargs):
         context = super().get_context_data(*args, **kwargs)
 
-        context['new_features'] = [ note for note in context['object'].notes.all() if note.note_type == note.NoteType.NEW_FEATURE]
-        context['bug_fixes'] = [ note for note in context['object'].notes.all() if note.note_type == note.NoteType.BUG_FIX]
-        context['known_issues'] = [ note for note in context['object'].notes.all() if note.note_type == note.NoteType.KNOWN_ISSUES]
+        context['notes'] = context['object'].get_notes_by_type()
+        context.update(context['notes'])        # new_features, bug_fixes and known_issues
 
-        return context
\ No newline at end of file
+        return context
@@ -0,0 +1,130 @@
+import hashlib
+import hmac
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from urllib import request as urllib_request
+from urllib.error import HTTPError, URLError
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.utils import timezone
+
+from releasenotes import config
+from releasenotes.models import OutboxMessage
+
+logger = logging.getLogger(__name__)
+
+SIGNATURE_HEADER = "X-Releasenotes-Signature"
+EVENT_HEADER = "X-Releasenotes-Event"
+DELIVERY_HEADER = "X-Releasenotes-Delivery"
+
+
+def sign_payload(secret, body):
+    '''
+    Returns the value for the signature header, a hex HMAC-SHA256 digest of the raw request body.
+    '''
+    digest = hmac.new(secret.encode("utf-8"), body, hashlib.sha256).hexdigest()
+    return "sha256={}".format(digest)
+
+
+def get_backoff(attempts, base=config.WEBHOOK_BACKOFF, maximum=config.WEBHOOK_MAX_BACKOFF):
+    return timedelta(seconds=min(base * (2 ** max(attempts - 1, 0)), maximum))
+
+
+def claim_messages(batch_size=config.WEBHOOK_BATCH_SIZE, lease=config.WEBHOOK_LEASE):
+    '''
+    Claim a batch of due messages by pushing their next attempt past the lease.  Other workers skip them until the lease
+    runs out, so a crashed worker's messages are picked up again later.
+    '''
+    now = timezone.now()
+    skip_locked = connection.features.has_select_for_update_skip_locked
+
+    with transaction.atomic():
+        ids = list(OutboxMessage.objects.due(now).select_for_update(skip_locked=skip_locked).order_by("next_attempt", "pk").values_list("pk", flat=True)[:batch_size])
+        OutboxMessage.objects.filter(pk__in=ids).update(next_attempt=now + timedelta(seconds=lease))
+
+    return list(OutboxMessage.objects.filter(pk__in=ids).select_related("webhook"))
+
+
+def post_message(message, timeout=config.WEBHOOK_TIMEOUT):
+    '''
+    POST a single message to its webhook.  Returns an error string, empty on success.  This runs in a worker thread so it
+    must not touch the database.
+    '''
+    body = json.dumps(message.payload, cls=DjangoJSONEncoder, sort_keys=True).encode("utf-8")
+    headers = {
+        "Content-Type": "application/json",
+        "User-Agent": "django-release-notes",
+        EVENT_HEADER: message.event,
+        DELIVERY_HEADER: str(message.uuid),
+    }
+    if message.webhook.secret:
+        headers[SIGNATURE_HEADER] = sign_payload(message.webhook.secret, body)
+
+    req = urllib_request.Request(message.webhook.url, data=body, headers=headers, method="POST")
+
+    try:
+        with urllib_request.urlopen(req, timeout=timeout):
+            return ""
+    except HTTPError as e:
+        return "HTTP {}".format(e.code)
+    except (URLError, OSError) as e:
+        return str(getattr(e, "reason", e))
+    except Exception as e:      # Malformed responses (http.client.HTTPException) or URLs, one bad endpoint must not lose the batch
+        return "{}: {}".format(type(e).__name__, e) if str(e) else type(e).__name__
+
+
+def deliver_batch(messages, workers=config.WEBHOOK_WORKERS, timeout=config.WEBHOOK_TIMEOUT, max_attempts=config.WEBHOOK_MAX_ATTEMPTS):
+    '''
+    Deliver the messages concurrently and record the results with a single bulk update.  Returns (delivered, failed).
+    '''
+    if not messages:
+        return 0, 0
+
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(messages)))) as executor:
+        errors = list(executor.map(lambda message: post_message(message, timeout), messages))
+
+    now = timezone.now()
+    delivered = failed = 0
+
+    for message, error in zip(messages, errors):
+        message.attempts += 1
+        message.last_error = error
+        message.updated = now
+
+        if not error:
+            message.status = OutboxMessage.Status.DELIVERED
+            message.delivered = now
+            delivered += 1
+            continue
+
+        logger.warning("Webhook delivery %s to %s failed (attempt %s): %s", message.uuid, message.webhook.url, message.attempts, error)
+        failed += 1
+
+        if message.attempts >= max_attempts:
+            message.status = OutboxMessage.Status.FAILED
+        else:
+            message.next_attempt = now + get_backoff(message.attempts)
+
+    OutboxMessage.objects.bulk_update(messages, ["attempts", "last_error", "updated", "status", "delivered", "next_attempt"])
+    return delivered, failed
+
+
+def drain_outbox(batch_size=config.WEBHOOK_BATCH_SIZE, workers=config.WEBHOOK_WORKERS, timeout=config.WEBHOOK_TIMEOUT, max_attempts=config.WEBHOOK_MAX_ATTEMPTS, max_batches=None):
+    '''
+    Deliver due messages batch by batch until none are left.  Returns (delivered, failed) totals.
+    '''
+    delivered = failed = batches = 0
+
+    while max_batches is None or batches < max_batches:
+        messages = claim_messages(batch_size)
+        if not messages:
+            break
+        batch_delivered, batch_failed = deliver_batch(messages, workers=workers, timeout=timeout, max_attempts=max_attempts)
+        delivered += batch_delivered
+        failed += batch_failed
+        batches += 1
+
+    return delivered, failed
@@ -56,7 +56,9 @@ setup(
             'django-markdownify',           # Used in the default templates
         ],
         'test': [],                         # Packages needed to run tests
-        'prod': [],                         # Packages needed to run in the deployment
+        'prod': [                           # Packages needed to run in the deployment
+            'Brotli',                       # Optional, adds brotli variants to the cached pages
+        ],
         'build': [                          # Packages needed to build the package
             'setuptools',
             'wheel',